@@ -3,6 +3,12 @@ FastAPI URL Shortener
 
 Features:
 - Random short code generation
+- Micro-batched inserts for concurrent link creation
+- Memory-mapped redirect snapshot for when Postgres is slow or down
+- Two-tier redirect cache (per-process LRU + optional shared Redis)
+- Opt-in request profiling and slow-query tracing
+- Fingerprinted, precompressed static assets and cached page rendering
+- Multi-worker deployments with instance-wide /metrics
 - PostgreSQL persistence via asyncpg
 - Click tracking and created_at metadata
 - Stats page per short link
@@ -10,28 +16,89 @@ Features:
 
 Author: Alex Lian
 """
+import asyncio
+import hashlib
+import logging
 import os
 import secrets
+import socket
 import string
+from collections import OrderedDict, deque
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 import asyncpg
+import redis.asyncio as aioredis
 from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+)
 from fastapi.templating import Jinja2Templates
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
+from assets import PrecompressedStaticFiles, load_manifest
+from metrics import WorkerMetrics, render_prometheus
+from profiling import ProfilingMiddleware, SlowQueryLogger, span
+from redirect_cache import RedirectCache
+from snapshot import RedirectSnapshot
+
 # -------------------------
 # Configuration
 # -------------------------
 
 MAX_CODE_ATTEMPTS = 10
+SHORTEN_BATCH_MAX_SIZE = int(os.getenv("SHORTEN_BATCH_MAX_SIZE", "100"))
+SHORTEN_BATCH_INTERVAL_MS = float(os.getenv("SHORTEN_BATCH_INTERVAL_MS", "5"))
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/url_shortener")
+# Set by scripts/serve.py (or by hand) to the number of uvicorn workers
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# Postgres connections this whole instance may hold; split evenly across workers
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "10"))
+# Shared per-instance directory the workers publish their counters through
+METRICS_DIR = os.getenv("METRICS_DIR", "")
 REDIS_URL = os.getenv("REDIS_URL", "memory://")
+REDIRECT_SNAPSHOT_PATH = os.getenv("REDIRECT_SNAPSHOT_PATH", "")
+# "fallback": Postgres first, snapshot when the DB times out or is unreachable.
+# "primary": snapshot first, Postgres only for codes newer than the snapshot.
+REDIRECT_SNAPSHOT_MODE = os.getenv("REDIRECT_SNAPSHOT_MODE", "fallback")
+REDIRECT_DB_TIMEOUT = float(os.getenv("REDIRECT_DB_TIMEOUT", "2"))
+# Shared L2 redirect cache; unset keeps the per-process L1 only.
+# Can share a server with REDIS_URL, but should use its own database number.
+REDIRECT_CACHE_URL = os.getenv("REDIRECT_CACHE_URL", "")
+REDIRECT_CACHE_TTL = int(os.getenv("REDIRECT_CACHE_TTL", "86400"))
+REDIRECT_CACHE_L1_SIZE = int(os.getenv("REDIRECT_CACHE_L1_SIZE", "10000"))
+REDIRECT_CACHE_L1_TTL = float(os.getenv("REDIRECT_CACHE_L1_TTL", "60"))
+# Seconds before a slow or unreachable Redis counts as a miss and falls through to Postgres
+REDIRECT_CACHE_TIMEOUT = float(os.getenv("REDIRECT_CACHE_TIMEOUT", "0.5"))
+# Guards /admin/*, /metrics and header-triggered profiling; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Fraction of requests profiled without being asked (0 = off), and how
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_MODE = os.getenv("PROFILE_SAMPLE_MODE", "spans")
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "100"))
+# Log statements slower than this many ms (0 = off)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "256"))
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "the database can't answer right now", as opposed to a bug:
+# timeouts, refused/reset/lost connections, unresolvable hosts, the server
+# shutting down, restarting or refusing logins (SQLSTATE class 57 and 53300)
+DB_UNAVAILABLE_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    socket.gaierror,
+    asyncpg.PostgresConnectionError,
+    asyncpg.OperatorInterventionError,
+    asyncpg.TooManyConnectionsError,
+)
 
 
 def _get_real_ip(request: Request) -> str:
@@ -55,7 +122,23 @@ def _get_real_ip(request: Request) -> str:
 limiter = Limiter(key_func=_get_real_ip, storage_uri=REDIS_URL, headers_enabled=True)
 
 templates = Jinja2Templates(directory="templates")
+asset_manifest = load_manifest("static")
+# {{ url_for('static', path=asset('style.css')) }} -> fingerprinted build if present
+templates.env.globals["asset"] = lambda name: asset_manifest.get(name, name)
 db_pool: asyncpg.Pool | None = None
+insert_coalescer: "InsertCoalescer | None" = None
+redirect_snapshot: RedirectSnapshot | None = None
+redirect_cache: RedirectCache | None = None
+profile_buffer: deque = deque(maxlen=PROFILE_BUFFER_SIZE)
+slow_query_buffer: deque = deque(maxlen=PROFILE_BUFFER_SIZE)
+rendered_pages: OrderedDict[tuple, tuple[bytes, str]] = OrderedDict()
+metrics = WorkerMetrics(METRICS_DIR or None)
+metrics.sources.append(
+    lambda: {
+        f"redirect_cache_{name}_total": value
+        for name, value in (redirect_cache.stats if redirect_cache else {}).items()
+    }
+)
 
 
 # -------------------------
@@ -64,18 +147,53 @@ db_pool: asyncpg.Pool | None = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global db_pool
-    db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=2, max_size=10)
+    global db_pool, insert_coalescer, redirect_snapshot, redirect_cache
+    if REDIRECT_SNAPSHOT_PATH:
+        redirect_snapshot = RedirectSnapshot(REDIRECT_SNAPSHOT_PATH)
+    min_size, max_size = pool_size(DB_CONNECTION_BUDGET, WEB_CONCURRENCY)
+    if redirect_snapshot is not None:
+        # Don't connect up front: the worker must come up and serve from the
+        # snapshot even while Postgres is unreachable
+        min_size = 0
+    db_pool = await asyncpg.create_pool(
+        DATABASE_URL, min_size=min_size, max_size=max_size, init=init_connection
+    )
     if os.getenv("SKIP_DB_INIT") != "1":
-        await init_db()
+        try:
+            await init_db()
+        except DB_UNAVAILABLE_ERRORS:
+            if redirect_snapshot is None:
+                raise
+            logger.exception("Database unavailable at startup; serving redirects from snapshot")
+    insert_coalescer = InsertCoalescer()
+    insert_coalescer.start()
+    redirect_cache = create_redirect_cache()
+    await redirect_cache.start()
+    metrics.start()
     yield
+    await metrics.stop()
+    await redirect_cache.stop()
+    if redirect_cache.redis is not None:
+        await redirect_cache.redis.aclose()
+    await insert_coalescer.stop()
     await db_pool.close()
+    if redirect_snapshot is not None:
+        redirect_snapshot.close()
+        redirect_snapshot = None
 
 
 app = FastAPI(lifespan=lifespan)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 app.state.limiter = limiter
 app.add_middleware(SlowAPIMiddleware)
+# Added last so it is outermost and its request timing includes rate limiting
+app.add_middleware(
+    ProfilingMiddleware,
+    buffer=profile_buffer,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    sample_mode=PROFILE_SAMPLE_MODE,
+    admin_token=ADMIN_TOKEN,
+)
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 
@@ -86,9 +204,7 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 @app.get("/", response_class=HTMLResponse)
 @limiter.limit("30/minute")
 async def home(request: Request):
-    return templates.TemplateResponse(
-        request, "index.html", {"short_url": None, "code": None}
-    )
+    return render_cached(request, "index.html", {"short_url": None, "code": None}, key=())
 
 
 @app.post("/shorten", response_class=HTMLResponse)
@@ -98,84 +214,364 @@ async def shorten(request: Request, long_url: str = Form(default="")):
     if not normalized:
         return HTMLResponse("Please enter a valid URL.", status_code=400)
 
-    created_at = datetime.now(timezone.utc)
-    code = None
-
-    for _ in range(MAX_CODE_ATTEMPTS):
-        candidate = generate_code()
-        try:
-            async with db_pool.acquire() as conn:
-                await conn.execute(
-                    "INSERT INTO urls (code, long_url, created_at, clicks) VALUES ($1, $2, $3, 0)",
-                    candidate, normalized, created_at,
-                )
-            code = candidate
-            break
-        except asyncpg.UniqueViolationError:
-            continue
-
+    with span("insert_coalescer.submit"):
+        code = await insert_coalescer.submit(normalized, datetime.now(timezone.utc))
     if code is None:
         return HTMLResponse("Could not generate a unique short code. Try again.", status_code=500)
+    metrics.inc("links_created_total")
 
     short_url = str(request.base_url) + code
-    return templates.TemplateResponse(
-        request, "index.html", {"short_url": short_url, "long_url": normalized, "code": code}
-    )
+    with span("render"):
+        return templates.TemplateResponse(
+            request, "index.html", {"short_url": short_url, "long_url": normalized, "code": code}
+        )
 
 
 @app.get("/top", response_class=HTMLResponse)
 @limiter.limit("30/minute")
 async def top_links(request: Request):
-    async with db_pool.acquire() as conn:
-        rows = await conn.fetch(
-            "SELECT code, long_url, clicks FROM urls ORDER BY clicks DESC, code ASC LIMIT 10"
-        )
-    return templates.TemplateResponse(request, "top.html", {"links": rows})
+    async with acquire_connection() as conn:
+        with span("db.select"):
+            rows = await conn.fetch(
+                "SELECT code, long_url, clicks FROM urls ORDER BY clicks DESC, code ASC LIMIT 10"
+            )
+    # The leaderboard itself is the cache key, so a new click order re-renders
+    return render_cached(
+        request, "top.html", {"links": rows}, key=tuple(tuple(row) for row in rows)
+    )
 
 
 @app.get("/stats/{code}", response_class=HTMLResponse)
 @limiter.limit("30/minute")
 async def stats(request: Request, code: str):
-    async with db_pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT long_url, clicks, created_at FROM urls WHERE code = $1", code
-        )
+    async with acquire_connection() as conn:
+        with span("db.select"):
+            row = await conn.fetchrow(
+                "SELECT long_url, clicks, created_at FROM urls WHERE code = $1", code
+            )
     if not row:
-        return templates.TemplateResponse(
+        return render_cached(
             request, "stats.html", {"error": "Short link not found.", "code": code},
-            status_code=404,
+            key=(code,), status_code=404,
         )
-    return templates.TemplateResponse(
-        request, "stats.html",
-        {
-            "error": None,
-            "code": code,
-            "long_url": row["long_url"],
-            "clicks": row["clicks"],
-            "created_at": row["created_at"],
-        },
-    )
+    with span("render"):
+        return templates.TemplateResponse(
+            request, "stats.html",
+            {
+                "error": None,
+                "code": code,
+                "long_url": row["long_url"],
+                "clicks": row["clicks"],
+                "created_at": row["created_at"],
+            },
+        )
+
+
+@app.get("/admin/profiles")
+@limiter.limit("30/minute")
+async def admin_profiles(request: Request):
+    """Recent request profiles and slow queries, newest last."""
+    if not is_admin(request):
+        return HTMLResponse("Not found", status_code=404)
+    return JSONResponse({
+        "profiles": list(profile_buffer),
+        "slow_queries": list(slow_query_buffer),
+    })
+
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request):
+    """Prometheus-format counters summed across every worker on this instance."""
+    if not is_admin(request):
+        return HTMLResponse("Not found", status_code=404)
+    totals, workers = metrics.aggregate()
+    return PlainTextResponse(render_prometheus(totals, workers))
 
 
 @app.get("/{code}")
 @limiter.limit("60/minute")
 async def redirect_to_url(request: Request, code: str):
-    async with db_pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT long_url FROM urls WHERE code = $1", code)
-        if not row:
-            return HTMLResponse("URL not found", status_code=404)
-        await conn.execute("UPDATE urls SET clicks = clicks + 1 WHERE code = $1", code)
-    return RedirectResponse(url=row["long_url"], status_code=302)
+    # Only bound the DB round trip when there is somewhere else to go
+    timeout = REDIRECT_DB_TIMEOUT if redirect_snapshot is not None else None
+
+    if redirect_snapshot is not None and REDIRECT_SNAPSHOT_MODE == "primary":
+        long_url = redirect_snapshot.get(code)
+        if long_url is not None:
+            # Click counting is best effort here — the redirect must not wait on a sick DB
+            try:
+                async with asyncio.timeout(timeout):
+                    async with acquire_connection() as conn:
+                        with span("db.update"):
+                            await conn.execute(
+                                "UPDATE urls SET clicks = clicks + 1 WHERE code = $1", code
+                            )
+            except DB_UNAVAILABLE_ERRORS:
+                pass
+            metrics.inc("redirects_total")
+            return RedirectResponse(url=long_url, status_code=302)
+
+    long_url = None
+    try:
+        async with asyncio.timeout(timeout):
+            with span("redirect_cache.get"):
+                long_url = await redirect_cache.get(code, lookup_long_url)
+            if long_url is None:
+                metrics.inc("redirects_not_found_total")
+                return HTMLResponse("URL not found", status_code=404)
+            async with acquire_connection() as conn:
+                with span("db.update"):
+                    await conn.execute("UPDATE urls SET clicks = clicks + 1 WHERE code = $1", code)
+    except DB_UNAVAILABLE_ERRORS:
+        if redirect_snapshot is None:
+            raise
+        # The lookup may have answered before the UPDATE timed out
+        long_url = long_url or redirect_snapshot.get(code)
+        if long_url is None:
+            return HTMLResponse("Service temporarily unavailable", status_code=503)
+        metrics.inc("redirect_snapshot_fallbacks_total")
+    metrics.inc("redirects_total")
+    return RedirectResponse(url=long_url, status_code=302)
+
+
+# -------------------------
+# Rendered page cache
+# -------------------------
+
+def render_cached(
+    request: Request, name: str, context: dict, key: tuple, status_code: int = 200
+) -> Response:
+    """Render name once per distinct key and answer If-None-Match with 304 (2xx pages only).
+
+    key must capture everything in context that changes the output; the base
+    URL is added here because url_for() bakes it into the page.
+    """
+    cache_key = (name, str(request.base_url), status_code, key)
+    with span("render"):
+        entry = rendered_pages.get(cache_key)
+        if entry is None:
+            body = templates.get_template(name).render({"request": request, **context}).encode()
+            entry = (body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+            rendered_pages[cache_key] = entry
+            while len(rendered_pages) > RENDER_CACHE_SIZE:
+                rendered_pages.popitem(last=False)
+        else:
+            rendered_pages.move_to_end(cache_key)
+
+    body, etag = entry
+    # Conditional requests only apply to successful responses; a 404 stays a 404
+    if not 200 <= status_code < 300:
+        return HTMLResponse(body, status_code=status_code)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return HTMLResponse(body, status_code=status_code, headers={"ETag": etag})
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+# -------------------------
+# Redirect lookups
+# -------------------------
+
+def create_redirect_cache() -> RedirectCache:
+    redis = None
+    if REDIRECT_CACHE_URL:
+        redis = aioredis.from_url(
+            REDIRECT_CACHE_URL,
+            decode_responses=True,
+            socket_timeout=REDIRECT_CACHE_TIMEOUT,
+            socket_connect_timeout=REDIRECT_CACHE_TIMEOUT,
+        )
+    return RedirectCache(
+        redis,
+        ttl=REDIRECT_CACHE_TTL,
+        l1_size=REDIRECT_CACHE_L1_SIZE,
+        l1_ttl=REDIRECT_CACHE_L1_TTL,
+    )
+
+
+async def lookup_long_url(code: str) -> str | None:
+    """Cache loader: the Postgres tier of the redirect lookup."""
+    async with acquire_connection() as conn:
+        with span("db.select"):
+            return await conn.fetchval("SELECT long_url FROM urls WHERE code = $1", code)
+
+
+# -------------------------
+# Insert coalescing
+# -------------------------
+
+class InsertCoalescer:
+    """Batch concurrent /shorten inserts into one multi-row INSERT per flush.
+
+    Callers enqueue a URL and await a future. A single writer task drains the
+    queue every SHORTEN_BATCH_INTERVAL_MS (or as soon as SHORTEN_BATCH_MAX_SIZE
+    rows are waiting) and writes the whole batch with one statement on one
+    pooled connection, so creation throughput scales with batch size rather
+    than with the pool's max_size.
+
+    Collisions are handled per row: ON CONFLICT DO NOTHING RETURNING code tells
+    us which candidates landed, and only the rows that conflicted get a fresh
+    code on the next attempt. A row that still has no code after
+    MAX_CODE_ATTEMPTS resolves to None.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = SHORTEN_BATCH_MAX_SIZE,
+        interval_ms: float = SHORTEN_BATCH_INTERVAL_MS,
+    ) -> None:
+        self.max_batch_size = max(1, max_batch_size)
+        self.interval = max(0.0, interval_ms) / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush whatever is queued, then stop the writer."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, long_url: str, created_at: datetime) -> str | None:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((long_url, created_at, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.interval
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list) -> None:
+        """Insert batch; if a row's data is rejected, bisect so only that row's caller fails.
+
+        insert_batch is all-or-nothing, so retrying halves can't double-insert.
+        Any other error (connection, schema, ...) would hit every row alike, so
+        it fails the whole batch at once.
+        """
+        try:
+            codes = await insert_batch([(url, created_at) for url, created_at, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1 or not isinstance(exc, asyncpg.DataError):
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+            middle = len(batch) // 2
+            await self._flush(batch[:middle])
+            await self._flush(batch[middle:])
+            return
+        metrics.inc("insert_batches_total")
+        metrics.inc("insert_batch_rows_total", len(batch))
+        for (_, _, future), code in zip(batch, codes):
+            if not future.done():
+                future.set_result(code)
+
+
+async def insert_batch(rows: list[tuple[str, datetime]]) -> list[str | None]:
+    """Insert (long_url, created_at) rows, returning each row's code or None.
+
+    Candidate codes are unique within the batch; rows whose candidate hit an
+    existing PRIMARY KEY are retried with a new code, up to MAX_CODE_ATTEMPTS.
+    All attempts share one transaction, so an error leaves no rows behind.
+    """
+    codes: list[str | None] = [None] * len(rows)
+    pending = list(range(len(rows)))
+
+    async with acquire_connection() as conn, conn.transaction():
+        for _ in range(MAX_CODE_ATTEMPTS):
+            if not pending:
+                break
+            candidates: dict[str, int] = {}
+            for index in pending:
+                candidate = generate_code()
+                while candidate in candidates:
+                    candidate = generate_code()
+                candidates[candidate] = index
+
+            inserted = await conn.fetch(
+                """
+                INSERT INTO urls (code, long_url, created_at, clicks)
+                SELECT code, long_url, created_at, 0
+                FROM unnest($1::text[], $2::text[], $3::timestamptz[])
+                    AS batch(code, long_url, created_at)
+                ON CONFLICT (code) DO NOTHING
+                RETURNING code
+                """,
+                list(candidates),
+                [rows[index][0] for index in candidates.values()],
+                [rows[index][1] for index in candidates.values()],
+            )
+            for record in inserted:
+                codes[candidates[record["code"]]] = record["code"]
+            pending = [index for index in pending if codes[index] is None]
+
+    return codes
 
 
 # -------------------------
 # Utility functions
 # -------------------------
 
+def is_admin(request: Request) -> bool:
+    """True if the request carries ADMIN_TOKEN as X-Admin-Token or a Bearer token."""
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get("X-Admin-Token")
+    if token is None:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def pool_size(budget: int, workers: int) -> tuple[int, int]:
+    """(min_size, max_size) for one worker's pool so all workers fit in budget.
+
+    Only holds for workers <= budget; scripts/serve.py caps the worker count.
+    """
+    max_size = max(1, budget // max(1, workers))
+    return min(2, max_size), max_size
+
+
 def normalize_url(raw: str | None) -> str | None:
     url = (raw or "").strip()
     if not url:
         return None
+    # NUL can't be stored in a TEXT column; other control characters have no place in a URL
+    if any(ord(ch) < 32 or ord(ch) == 127 for ch in url):
+        return None
     lower = url.lower()
     if lower.startswith(("javascript:", "data:", "file:")):
         return None
@@ -189,6 +585,23 @@ def generate_code(length: int = 6) -> str:
     return "".join(secrets.choice(alphabet) for _ in range(length))
 
 
+@asynccontextmanager
+async def acquire_connection():
+    """db_pool.acquire(), with the wait for a free connection timed as its own span."""
+    with span("pool.acquire"):
+        conn = await db_pool.acquire()
+    try:
+        yield conn
+    finally:
+        await db_pool.release(conn)
+
+
+async def init_connection(conn: asyncpg.Connection) -> None:
+    """Per-connection pool setup: attach the slow query logger when enabled."""
+    if SLOW_QUERY_MS > 0:
+        conn.add_query_logger(SlowQueryLogger(slow_query_buffer, SLOW_QUERY_MS))
+
+
 async def init_db() -> None:
     async with db_pool.acquire() as conn:
         await conn.execute(
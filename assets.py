@@ -0,0 +1,86 @@
+"""
+Serving for the fingerprinted, precompressed assets built by scripts/build_static.py.
+
+The manifest maps "style.css" to "dist/style.<hash>.css". Templates resolve
+asset names through it, so pages reference the fingerprinted file whenever a
+build exists and fall back to the plain file in development.
+"""
+import json
+import mimetypes
+import os
+import stat
+from pathlib import Path
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+DIST_PREFIX = "dist" + os.sep
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Preferred first
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest(static_dir: str | Path) -> dict[str, str]:
+    """Return the build manifest, or {} if scripts/build_static.py hasn't run."""
+    try:
+        return json.loads((Path(static_dir) / "dist" / "manifest.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Content codings from an Accept-Encoding header, minus any with q=0."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        q = params.strip().removeprefix("q=").strip() if params else "1"
+        try:
+            if coding and float(q) > 0:
+                accepted.add(coding)
+        except ValueError:
+            continue
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves .br/.gz siblings and marks fingerprinted files immutable."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if path.startswith(DIST_PREFIX):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _precompressed_response(self, path: str, scope) -> Response | None:
+        if scope["method"] not in ("GET", "HEAD"):
+            return None
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                full_path, stat_result = await anyio.to_thread.run_sync(
+                    self.lookup_path, path + suffix
+                )
+            except (OSError, ValueError):
+                return None
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
@@ -0,0 +1,109 @@
+"""
+Per-worker counters aggregated instance-wide through a shared directory.
+
+Each uvicorn worker keeps its counters in memory and periodically writes them
+to `<directory>/worker-<pid>.json`. Any worker answering /metrics sums every
+file in the directory, so the numbers cover the whole instance no matter which
+worker the request lands on. Files from workers that have exited are kept so
+counters never go backwards when uvicorn replaces a worker.
+
+Without a directory (single worker, tests) aggregation is just this worker.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "url_shortener_"
+
+
+class WorkerMetrics:
+    def __init__(self, directory: str | Path | None = None, flush_interval: float = 1.0) -> None:
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.counters: Counter[str] = Counter()
+        self.sources: list = []
+        self._task: asyncio.Task | None = None
+
+    def inc(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def snapshot(self) -> dict[str, int]:
+        """This worker's counters, plus any registered sources' stats dicts."""
+        values = Counter(self.counters)
+        for source in self.sources:
+            values.update(source())
+        return dict(values)
+
+    def flush(self) -> None:
+        if self.directory is None:
+            return
+        path = self.directory / f"worker-{os.getpid()}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp_path, path)
+
+    def aggregate(self) -> tuple[dict[str, int], int]:
+        """Return (instance-wide counters, number of live workers)."""
+        if self.directory is None:
+            return self.snapshot(), 1
+        self.flush()
+        totals: Counter[str] = Counter()
+        live = 0
+        for path in self.directory.glob("worker-*.json"):
+            try:
+                totals.update(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+            if _pid_alive(int(path.stem.removeprefix("worker-"))):
+                live += 1
+        return dict(totals), live
+
+    def start(self) -> None:
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.flush()
+            except OSError:
+                logger.warning("Could not write worker metrics", exc_info=True)
+            await asyncio.sleep(self.flush_interval)
+
+
+def render_prometheus(totals: dict[str, int], workers: int) -> str:
+    lines = [
+        f"# TYPE {METRIC_PREFIX}workers gauge",
+        f"{METRIC_PREFIX}workers {workers}",
+    ]
+    for name in sorted(totals):
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+        lines.append(f"{METRIC_PREFIX}{name} {totals[name]}")
+    return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,213 @@
+"""
+Opt-in request profiling and slow-query tracing.
+
+A request is profiled when it is sampled (sample_rate) or when it carries
+`X-Profile: spans|cprofile` together with a valid `X-Admin-Token`. Profiled
+requests record wall-clock spans (pool acquisition, queries, rendering, ...)
+and optionally a cProfile dump into a ring buffer that the admin endpoint
+serves.
+
+Unprofiled requests pay for one ContextVar lookup per span() call and nothing
+else; with profiling fully disabled the middleware is a straight pass-through.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import random
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("spans", "cprofile")
+CPROFILE_TOP_N = 25
+
+_current: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+_NULL_SPAN = nullcontext()
+_cprofile_active = False
+
+
+class RequestProfile:
+    """Spans (and optionally cProfile output) captured for one request."""
+
+    def __init__(self, method: str, path: str, mode: str) -> None:
+        self.method = method
+        self.path = path
+        self.mode = mode
+        self.started_at = datetime.now(timezone.utc)
+        self.status_code: int | None = None
+        self.duration_ms: float | None = None
+        self.spans: list[dict] = []
+        self.cprofile: str | None = None
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.spans.append({
+                "name": name,
+                "depth": self._depth,
+                "start_ms": round((start - self._start) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+        self.spans.sort(key=lambda s: s["start_ms"])
+
+    def to_dict(self) -> dict:
+        # Whatever the top-level spans don't cover went to middleware
+        # (rate limiting), routing and response serialization
+        covered = sum(s["duration_ms"] for s in self.spans if s["depth"] == 0)
+        return {
+            "method": self.method,
+            "path": self.path,
+            "mode": self.mode,
+            "started_at": self.started_at.isoformat(),
+            "status_code": self.status_code,
+            "duration_ms": self.duration_ms,
+            "unaccounted_ms": round((self.duration_ms or 0) - covered, 3),
+            "spans": self.spans,
+            "cprofile": self.cprofile,
+        }
+
+
+def span(name: str):
+    """Time a block if the current request is being profiled, else do nothing."""
+    profile = _current.get()
+    if profile is None:
+        return _NULL_SPAN
+    return profile.span(name)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that decides per request whether to profile it.
+
+    Add it last so it wraps every other middleware (including SlowAPIMiddleware)
+    and the request total covers them.
+    """
+
+    def __init__(
+        self,
+        app,
+        buffer: deque,
+        sample_rate: float = 0.0,
+        sample_mode: str = "spans",
+        admin_token: str = "",
+    ) -> None:
+        self.app = app
+        self.buffer = buffer
+        self.sample_rate = sample_rate
+        self.sample_mode = sample_mode if sample_mode in PROFILE_MODES else "spans"
+        self.admin_token = admin_token.encode()
+        self.enabled = sample_rate > 0 or bool(admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = self._requested_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], mode)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+            await send(message)
+
+        global _cprofile_active
+        profiler = None
+        # Only one cProfile can be active per interpreter; overlapping requests get spans
+        if mode == "cprofile" and not _cprofile_active:
+            _cprofile_active = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif mode == "cprofile":
+            profile.mode = "spans"
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                _cprofile_active = False
+                profile.cprofile = _format_stats(profiler)
+            profile.finish()
+            self.buffer.append(profile.to_dict())
+
+    def _requested_mode(self, scope) -> str | None:
+        if self.admin_token:
+            requested = token = None
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    requested = value.decode("latin-1").strip().lower()
+                elif name == b"x-admin-token":
+                    token = value
+            if (
+                requested in PROFILE_MODES
+                and token is not None
+                and secrets.compare_digest(token, self.admin_token)
+            ):
+                return requested
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.sample_mode
+        return None
+
+
+def _format_stats(profiler: cProfile.Profile) -> str:
+    # cProfile sees every coroutine the event loop ran while enabled,
+    # not just this request's
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(CPROFILE_TOP_N)
+    return out.getvalue()
+
+
+# -------------------------
+# Slow query logging
+# -------------------------
+
+def param_shape(value) -> str:
+    """Describe a query parameter without leaking its contents."""
+    name = type(value).__name__
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"{name}[{len(value)}]"
+    return name
+
+
+class SlowQueryLogger:
+    """asyncpg query logger that keeps statements slower than threshold_ms."""
+
+    def __init__(self, buffer: deque, threshold_ms: float) -> None:
+        self.buffer = buffer
+        self.threshold_ms = threshold_ms
+
+    def __call__(self, record) -> None:
+        elapsed_ms = record.elapsed * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+        entry = {
+            "query": " ".join(record.query.split()),
+            "params": [param_shape(arg) for arg in (record.args or ())],
+            "elapsed_ms": round(elapsed_ms, 3),
+            "error": repr(record.exception) if record.exception else None,
+            "logged_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.buffer.append(entry)
+        logger.warning("Slow query (%.1f ms): %s %s", elapsed_ms, entry["query"], entry["params"])
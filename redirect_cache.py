@@ -0,0 +1,246 @@
+"""
+Two-tier redirect cache: per-process LRU (L1) in front of an optional Redis (L2).
+
+Lookups go L1 -> L2 -> loader (Postgres). Concurrent misses for the same code
+share one fill (single-flight), and L2 reads issued in the same event-loop
+tick are coalesced into one MGET. Invalidation is broadcast over Redis pub/sub
+so every instance drops its L1 entry; keyspace "expired" events for the
+cache's own database are honoured too when the server has
+`notify-keyspace-events Ex` enabled.
+
+The L2 is strictly optional — any Redis error degrades to an L1 + loader
+lookup instead of failing the request.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+REDIS_ERRORS = (RedisError, OSError)
+# How long one pub/sub poll waits for a message before looping
+LISTEN_POLL_SECONDS = 1.0
+RESUBSCRIBE_DELAY_SECONDS = 1.0
+
+
+class RedirectCache:
+    """code -> long_url cache shared by the redirect route."""
+
+    def __init__(
+        self,
+        redis=None,
+        *,
+        ttl: int = 86400,
+        l1_size: int = 10000,
+        l1_ttl: float = 60.0,
+        key_prefix: str = "redirect:",
+        channel: str = "redirect-cache:invalidate",
+    ) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.l1_size = l1_size
+        self.l1_ttl = l1_ttl
+        self.key_prefix = key_prefix
+        self.channel = channel
+        self._l1: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        # Where lookups were answered: l1_hits, l2_hits, loads (went to the loader)
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "loads": 0}
+        self._fills: dict[str, asyncio.Task] = {}
+        self._mget_pending: dict[str, asyncio.Future] = {}
+        # Strong references to in-flight MGET flushes; the loop only keeps weak ones
+        self._mget_flushes: set[asyncio.Task] = set()
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
+
+    # -- lifecycle --------------------------------------------------------
+
+    async def start(self) -> None:
+        """Subscribe to invalidation messages (no-op without an L2).
+
+        An unreachable Redis doesn't fail startup: the listener keeps retrying
+        the subscription in the background while lookups fall through to the
+        loader.
+        """
+        if self.redis is None:
+            return
+        try:
+            await self._subscribe()
+        except REDIS_ERRORS:
+            logger.warning("Redirect cache could not subscribe; retrying in background", exc_info=True)
+            await self._close_pubsub()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._close_pubsub()
+
+    # -- lookups ----------------------------------------------------------
+
+    async def get(
+        self, code: str, loader: Callable[[str], Awaitable[str | None]]
+    ) -> str | None:
+        """Return the long URL for code, calling loader(code) at most once per miss.
+
+        The fill runs as its own task and callers await it through shield(), so
+        a caller that times out or disconnects doesn't cancel the fill for
+        everyone else waiting on the same code.
+        """
+        long_url = self._l1_get(code)
+        if long_url is not None:
+            self.stats["l1_hits"] += 1
+            return long_url
+
+        fill = self._fills.get(code)
+        if fill is None:
+            fill = asyncio.create_task(self._fill(code, loader))
+            self._fills[code] = fill
+            fill.add_done_callback(lambda _: self._fills.pop(code, None))
+        return await asyncio.shield(fill)
+
+    async def invalidate(self, code: str) -> None:
+        """Drop code from every tier on every instance.
+
+        Call this after deleting or repointing a row; the mapping is otherwise
+        treated as immutable.
+        """
+        self._l1.pop(code, None)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self.key_prefix + code)
+            await self.redis.publish(self.channel, code)
+        except REDIS_ERRORS:
+            logger.warning("Redirect cache invalidation failed for %s", code, exc_info=True)
+
+    # -- internals --------------------------------------------------------
+
+    async def _fill(self, code: str, loader: Callable[[str], Awaitable[str | None]]) -> str | None:
+        try:
+            long_url = await self._l2_get(code)
+            l2_reachable = self.redis is not None
+        except REDIS_ERRORS:
+            # Redis just failed (or timed out on) this read; don't make the caller wait on a SET too
+            long_url, l2_reachable = None, False
+        if long_url is not None:
+            self.stats["l2_hits"] += 1
+        else:
+            self.stats["loads"] += 1
+            long_url = await loader(code)
+            if long_url is not None and l2_reachable:
+                try:
+                    await self.redis.set(self.key_prefix + code, long_url, ex=self.ttl)
+                except REDIS_ERRORS:
+                    logger.warning("Redirect cache SET failed for %s", code, exc_info=True)
+        if long_url is not None:
+            self._l1_put(code, long_url)
+        return long_url
+
+    async def _l2_get(self, code: str) -> str | None:
+        """Queue code for the next pipelined MGET and wait for its result.
+
+        Raises the Redis error if the MGET failed.
+        """
+        if self.redis is None:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        if not self._mget_pending:
+            # The flush task first runs on the next loop iteration, so every
+            # miss queued during this one rides the same MGET
+            flush = asyncio.create_task(self._flush_mget())
+            self._mget_flushes.add(flush)
+            flush.add_done_callback(self._mget_flushes.discard)
+        self._mget_pending[code] = future
+        return await future
+
+    async def _flush_mget(self) -> None:
+        pending, self._mget_pending = self._mget_pending, {}
+        try:
+            values = await self.redis.mget([self.key_prefix + code for code in pending])
+        except REDIS_ERRORS as exc:
+            logger.warning("Redirect cache MGET failed", exc_info=True)
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for future, long_url in zip(pending.values(), values):
+            if not future.done():
+                future.set_result(long_url)
+
+    def _expired_channel(self) -> str:
+        # Only this cache's database — other databases' expiries (e.g. rate
+        # limit counters) would reach every instance just to be dropped
+        db = self.redis.connection_pool.connection_kwargs.get("db", 0)
+        return f"__keyevent@{db}__:expired"
+
+    async def _subscribe(self) -> None:
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(self.channel, self._expired_channel())
+
+    async def _close_pubsub(self) -> None:
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.aclose()
+        except REDIS_ERRORS:
+            pass
+        self._pubsub = None
+
+    async def _listen(self) -> None:
+        # Polls with a timeout rather than blocking in listen(), so the
+        # client's socket_timeout doesn't read an idle channel as a dead one
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=LISTEN_POLL_SECONDS
+                )
+                if message is not None:
+                    self._handle_message(message)
+            except REDIS_ERRORS:
+                logger.warning("Redirect cache subscription dropped; retrying", exc_info=True)
+                await self._close_pubsub()
+                await asyncio.sleep(RESUBSCRIBE_DELAY_SECONDS)
+
+    def _handle_message(self, message: dict) -> None:
+        data = message.get("data")
+        if isinstance(data, bytes):
+            data = data.decode()
+        channel = message.get("channel")
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        if message["type"] != "message":
+            return
+        if channel == self.channel:
+            self._l1.pop(data, None)
+        elif data.startswith(self.key_prefix):
+            self._l1.pop(data[len(self.key_prefix):], None)
+
+    def _l1_get(self, code: str) -> str | None:
+        entry = self._l1.get(code)
+        if entry is None:
+            return None
+        long_url, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._l1[code]
+            return None
+        self._l1.move_to_end(code)
+        return long_url
+
+    def _l1_put(self, code: str, long_url: str) -> None:
+        if self.l1_size <= 0:
+            return
+        self._l1[code] = (long_url, time.monotonic() + self.l1_ttl)
+        self._l1.move_to_end(code)
+        while len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
@@ -0,0 +1,132 @@
+"""
+Benchmark request throughput as the number of uvicorn workers grows.
+
+Usage:
+    export DATABASE_URL=postgresql://localhost/url_shortener
+    export REDIS_URL=redis://localhost:6379
+    python scripts/bench_workers.py --max-workers 4 --duration 10
+
+For each worker count from 1 to --max-workers this starts scripts/serve.py,
+waits until it answers, drives --path with --concurrency open requests from
+--load-procs client processes for --duration seconds, and prints requests per
+second alongside the speedup over one worker. Every request carries a random
+X-Forwarded-For so the per-IP rate limit doesn't cap the result.
+
+Client processes compete with the server for CPU, so on a machine with few
+cores the measured speedup understates what a dedicated instance gets.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from scripts.serve import available_cpus  # noqa: E402
+
+
+def _random_ip() -> str:
+    return f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+
+
+async def _drive(url: str, concurrency: int, duration: float) -> tuple[int, int]:
+    ok = errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal ok, errors
+        while time.monotonic() < deadline:
+            try:
+                r = await client.get(url, headers={"X-Forwarded-For": _random_ip()})
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if r.status_code < 400:
+                ok += 1
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, follow_redirects=False, timeout=10) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return ok, errors
+
+
+def _load_proc(args: tuple[str, int, float]) -> tuple[int, int]:
+    return asyncio.run(_drive(*args))
+
+
+def _wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, headers={"X-Forwarded-For": _random_ip()}, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {url} did not become ready within {timeout:.0f}s.")
+
+
+def run_level(workers: int, args) -> tuple[float, int]:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(args.port), HOST="127.0.0.1")
+    env.pop("METRICS_DIR", None)
+    server = subprocess.Popen(
+        [sys.executable, str(ROOT_DIR / "scripts" / "serve.py")],
+        env=env, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{args.port}{args.path}"
+    try:
+        _wait_until_ready(url)
+        per_proc = max(1, args.concurrency // args.load_procs)
+        with multiprocessing.Pool(args.load_procs) as pool:
+            results = pool.map(_load_proc, [(url, per_proc, args.duration)] * args.load_procs)
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return ok / args.duration, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=available_cpus())
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--load-procs", type=int, default=2)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        raise SystemExit("DATABASE_URL is required.")
+    if args.max_workers > 1 and os.getenv("REDIS_URL", "memory://").startswith("memory://"):
+        raise SystemExit("REDIS_URL must point at Redis; serve.py runs one worker with memory:// storage.")
+
+    print(f"{'workers':>7}  {'req/s':>10}  {'speedup':>7}  {'errors':>6}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rps, errors = run_level(workers, args)
+        baseline = baseline or rps
+        speedup = rps / baseline if baseline else 0.0
+        print(f"{workers:>7}  {rps:>10.1f}  {speedup:>6.2f}x  {errors:>6}")
+
+
+if __name__ == "__main__":
+    main()
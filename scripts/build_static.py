@@ -0,0 +1,78 @@
+"""
+Fingerprint and precompress static assets for long-lived, immutable caching.
+
+Usage:
+    pip install brotli  # optional; without it only .gz variants are written
+    python scripts/build_static.py
+
+For every file under static/ (except static/dist/) this writes
+static/dist/<name>.<hash><ext> plus .gz and .br siblings, and a
+static/dist/manifest.json mapping the original path to the fingerprinted one.
+The app serves the manifest's names with `Cache-Control: immutable` and picks
+the precompressed variant that matches the client's Accept-Encoding.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+DIST_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+
+
+def fingerprint(relative: Path, content: bytes) -> Path:
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return relative.with_name(f"{relative.stem}.{digest}{relative.suffix}")
+
+
+def build(static_dir: Path) -> dict[str, str]:
+    dist_dir = static_dir / DIST_NAME
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+    dist_dir.mkdir()
+
+    manifest: dict[str, str] = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or dist_dir in source.parents:
+            continue
+        relative = source.relative_to(static_dir)
+        content = source.read_bytes()
+        target = dist_dir / fingerprint(relative, content)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        # mtime=0 keeps the .gz byte-identical across builds
+        target.with_name(target.name + ".gz").write_bytes(
+            gzip.compress(content, compresslevel=9, mtime=0)
+        )
+        if brotli is not None:
+            target.with_name(target.name + ".br").write_bytes(
+                brotli.compress(content, quality=11)
+            )
+        manifest[relative.as_posix()] = target.relative_to(static_dir).as_posix()
+
+    (dist_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--static-dir", default=str(ROOT_DIR / "static"))
+    args = parser.parse_args()
+
+    manifest = build(Path(args.static_dir).expanduser().resolve())
+    encodings = "gzip, br" if brotli is not None else "gzip (install brotli for .br)"
+    print(f"Static build complete: assets={len(manifest)} encodings={encodings}")
+
+
+if __name__ == "__main__":
+    main()
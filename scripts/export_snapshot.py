@@ -0,0 +1,62 @@
+"""
+Export every code -> long_url mapping into a memory-mappable redirect snapshot.
+
+Usage:
+    pip install psycopg2-binary  # one-time, not in main deps
+    export DATABASE_URL=postgresql://localhost/url_shortener
+    python scripts/export_snapshot.py --output redirects.snap
+
+Point REDIRECT_SNAPSHOT_PATH at the output file to let the app serve
+redirects from it (see README).
+
+Every mapping is held in memory while the snapshot is built, so run it
+somewhere with RAM for the whole urls table.
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from snapshot import write_snapshot  # noqa: E402
+
+
+def iter_rows(pg_conn, batch_size: int = 10000):
+    # Named cursor = server-side cursor, so psycopg2 fetches in batches rather
+    # than buffering the whole result. write_snapshot() still collects and
+    # sorts every row in memory before writing, so peak memory is the full table.
+    with pg_conn.cursor(name="export_snapshot") as cur:
+        cur.itersize = batch_size
+        cur.execute("SELECT code, long_url FROM urls")
+        yield from cur
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default="redirects.snap")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise SystemExit("DATABASE_URL is required.")
+
+    output = Path(args.output).expanduser().resolve()
+
+    pg_conn = psycopg2.connect(database_url, connect_timeout=10)
+    try:
+        with pg_conn:
+            exported = write_snapshot(output, iter_rows(pg_conn))
+    finally:
+        pg_conn.close()
+
+    print(f"Snapshot complete: exported={exported} links to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Run the app under uvicorn with one worker per available CPU.
+
+Usage:
+    python scripts/serve.py                     # workers = CPUs available to this container
+    WEB_CONCURRENCY=4 python scripts/serve.py   # explicit worker count
+
+The worker count is exported as WEB_CONCURRENCY so each worker can size its
+asyncpg pool from DB_CONNECTION_BUDGET, and a fresh METRICS_DIR is created
+(unless one is given) so /metrics can sum counters across workers.
+
+Every worker needs at least one connection, so the worker count is capped at
+DB_CONNECTION_BUDGET. Rate limits are only enforced instance-wide when REDIS_URL points at a real
+Redis; with the default memory:// storage every worker would keep its own
+counters, so a single worker is started instead.
+"""
+
+import math
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use, honouring cgroup v2 quotas (Cloud Run, Docker)."""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count(requested: int, redis_url: str, budget: int) -> int:
+    """Workers to actually start, warning on stderr when requested is reduced."""
+    if requested > budget:
+        print(
+            f"{requested} workers would need at least {requested} Postgres connections but "
+            f"DB_CONNECTION_BUDGET is {budget}. Starting {budget} workers.",
+            file=sys.stderr,
+        )
+        requested = budget
+    if requested > 1 and redis_url.startswith("memory://"):
+        print(
+            f"REDIS_URL is {redis_url}, so each worker would rate limit on its own and "
+            f"per-IP limits would be multiplied by {requested}. Starting 1 worker; "
+            "set REDIS_URL to a Redis server to run more.",
+            file=sys.stderr,
+        )
+        return 1
+    return requested
+
+
+def main() -> None:
+    requested = int(os.getenv("WEB_CONCURRENCY") or available_cpus())
+    if requested < 1:
+        raise SystemExit("WEB_CONCURRENCY must be at least 1.")
+    budget = int(os.getenv("DB_CONNECTION_BUDGET", "10"))
+    if budget < 1:
+        raise SystemExit("DB_CONNECTION_BUDGET must be at least 1.")
+    workers = worker_count(requested, os.getenv("REDIS_URL", "memory://"), budget)
+
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if workers > 1 and not os.getenv("METRICS_DIR"):
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="url-shortener-metrics-")
+
+    print(f"Starting uvicorn: workers={workers}", file=sys.stderr)
+    uvicorn.run(
+        "app:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8080")),
+        workers=workers,
+        app_dir=str(ROOT_DIR),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Read-only redirect snapshot: a sorted code -> long_url file served via mmap.
+
+File layout (little-endian):
+
+    header   magic b"URLS", version u16, code_width u16, count u32, heap_offset u64
+    index    count entries, sorted by code:
+                 code (code_width bytes, NUL-padded), url_offset u64, url_length u32
+    heap     UTF-8 long URLs, url_offset is relative to heap_offset
+
+Codes are fixed width so the index can be binary-searched in place. Every
+uvicorn worker that opens the same file maps the same pages, so the OS page
+cache holds one copy no matter how many workers serve redirects.
+"""
+import mmap
+import os
+import struct
+from collections.abc import Iterable
+from pathlib import Path
+
+MAGIC = b"URLS"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIQ")
+_ENTRY_TAIL = struct.Struct("<QI")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or not a snapshot."""
+
+
+def write_snapshot(path: str | Path, rows: Iterable[tuple[str, str]]) -> int:
+    """Write (code, long_url) rows to path and return the number written.
+
+    The file is written next to path and renamed into place, so workers that
+    reopen the snapshot never see a half-written file.
+    """
+    entries = sorted((code.encode(), long_url.encode()) for code, long_url in rows)
+    code_width = max((len(code) for code, _ in entries), default=0)
+    if code_width > 0xFFFF:
+        raise SnapshotError("Short codes are too long for a snapshot index.")
+
+    entry_size = code_width + _ENTRY_TAIL.size
+    heap_offset = _HEADER.size + entry_size * len(entries)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, code_width, len(entries), heap_offset))
+        url_offset = 0
+        for code, long_url in entries:
+            f.write(code.ljust(code_width, b"\0"))
+            f.write(_ENTRY_TAIL.pack(url_offset, len(long_url)))
+            url_offset += len(long_url)
+        for _, long_url in entries:
+            f.write(long_url)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+class RedirectSnapshot:
+    """Memory-mapped, binary-searchable view of a snapshot file."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        try:
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            raise SnapshotError(f"Cannot map snapshot {self.path}: {exc}") from exc
+
+        if len(self._mm) < _HEADER.size:
+            self._mm.close()
+            raise SnapshotError(f"Snapshot {self.path} is truncated.")
+        magic, version, code_width, count, heap_offset = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise SnapshotError(f"{self.path} is not a version {VERSION} snapshot.")
+
+        self.code_width = code_width
+        self._count = count
+        self._entry_size = code_width + _ENTRY_TAIL.size
+        self._heap_offset = heap_offset
+        if heap_offset != _HEADER.size + self._entry_size * count or heap_offset > len(self._mm):
+            self._mm.close()
+            raise SnapshotError(f"Snapshot {self.path} is truncated.")
+        self._view = memoryview(self._mm)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, code: str) -> str | None:
+        """Return the long URL for code, or None if the snapshot doesn't have it."""
+        key = code.encode()
+        if not key or len(key) > self.code_width:
+            return None
+        key = key.ljust(self.code_width, b"\0")
+
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = _HEADER.size + mid * self._entry_size
+            probe = self._mm[pos:pos + self.code_width]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                url_offset, url_length = _ENTRY_TAIL.unpack_from(self._mm, pos + self.code_width)
+                start = self._heap_offset + url_offset
+                # Decode straight out of the mapping — no intermediate bytes copy
+                return str(self._view[start:start + url_length], "utf-8")
+        return None
+
+    def close(self) -> None:
+        self._view.release()
+        self._mm.close()
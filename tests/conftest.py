@@ -21,6 +21,8 @@ os.environ["SKIP_DB_INIT"] = "1"
 
 import app as app_module  # noqa: E402
 from app import app as fastapi_app, init_db  # noqa: E402
+from redirect_cache import RedirectCache  # noqa: E402
+from tests.fake_redis import FakeRedis  # noqa: E402
 
 
 @pytest.fixture
@@ -40,12 +42,44 @@ async def db_pool():
 
 @pytest.fixture
 async def client(db_pool):
-    """Per-test async HTTP client. Depends on db_pool so the pool is ready before requests."""
+    """Per-test async HTTP client. Depends on db_pool so the pool is ready before requests.
+
+    The lifespan isn't triggered, so the insert coalescer and redirect cache
+    it would create are set up here instead, on the test's own event loop.
+    The cache is L1-only and fresh per test so cached redirects can't leak
+    across the clean_db wipe; rendered pages are dropped for the same reason.
+    """
     from httpx import AsyncClient, ASGITransport
+    app_module.insert_coalescer = app_module.InsertCoalescer()
+    app_module.insert_coalescer.start()
+    app_module.redirect_cache = RedirectCache()
+    app_module.rendered_pages.clear()
     async with AsyncClient(
         transport=ASGITransport(app=fastapi_app), base_url="http://test"
     ) as ac:
         yield ac
+    await app_module.insert_coalescer.stop()
+    app_module.insert_coalescer = None
+    app_module.redirect_cache = None
+
+
+@pytest.fixture
+async def redis_client():
+    """Redis for the L2 cache tests: a real server if TEST_REDIS_URL is set, else a fake.
+
+    A real server gets flushed before and after the test, so point
+    TEST_REDIS_URL at a scratch database.
+    """
+    test_redis_url = os.environ.get("TEST_REDIS_URL")
+    if not test_redis_url:
+        yield FakeRedis()
+        return
+    import redis.asyncio as aioredis
+    client = aioredis.from_url(test_redis_url, decode_responses=True)
+    await client.flushdb()
+    yield client
+    await client.flushdb()
+    await client.aclose()
 
 
 @pytest.fixture(autouse=True)
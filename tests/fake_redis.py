@@ -0,0 +1,108 @@
+"""
+In-memory stand-in for the slice of redis.asyncio that RedirectCache uses.
+
+Supports GET/MGET/SET EX/DELETE, PUBLISH and a pub/sub object with SUBSCRIBE
+and get_message(). Expiry runs off a manual clock (advance()) and publishes
+`__keyevent@<db>__:expired` like a server with `notify-keyspace-events Ex`,
+so expiry handling is testable without sleeping.
+"""
+import asyncio
+from types import SimpleNamespace
+
+
+class FakeRedis:
+    def __init__(self, db: int = 0) -> None:
+        self.db = db
+        # Where redis-py keeps the parsed URL, including the database number
+        self.connection_pool = SimpleNamespace(connection_kwargs={"db": db})
+        self.data: dict[str, str] = {}
+        self.expires_at: dict[str, float] = {}
+        self.now = 0.0
+        self.commands: list[tuple] = []
+        self._subscribers: list["FakePubSub"] = []
+
+    async def get(self, key):
+        self.commands.append(("GET", key))
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        keys = list(keys)
+        self.commands.append(("MGET", *keys))
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.commands.append(("SET", key, value))
+        self.data[key] = value
+        if ex is not None:
+            self.expires_at[key] = self.now + ex
+        else:
+            self.expires_at.pop(key, None)
+        return True
+
+    async def delete(self, *keys):
+        self.commands.append(("DEL", *keys))
+        removed = 0
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                removed += 1
+            self.expires_at.pop(key, None)
+        return removed
+
+    async def publish(self, channel, message):
+        self.commands.append(("PUBLISH", channel, message))
+        return self._deliver(channel, message)
+
+    def pubsub(self) -> "FakePubSub":
+        pubsub = FakePubSub(self)
+        self._subscribers.append(pubsub)
+        return pubsub
+
+    async def aclose(self) -> None:
+        pass
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward, expiring keys and publishing expired events."""
+        self.now += seconds
+        for key, deadline in list(self.expires_at.items()):
+            if deadline <= self.now:
+                del self.expires_at[key]
+                self.data.pop(key, None)
+                self._deliver(f"__keyevent@{self.db}__:expired", key)
+
+    def _deliver(self, channel: str, message: str) -> int:
+        delivered = 0
+        for pubsub in self._subscribers:
+            delivered += pubsub._deliver(channel, message)
+        return delivered
+
+
+class FakePubSub:
+    def __init__(self, redis: FakeRedis) -> None:
+        self._redis = redis
+        self._channels: set[str] = set()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self._channels.add(channel)
+            self._queue.put_nowait({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        while True:
+            try:
+                message = await asyncio.wait_for(self._queue.get(), timeout)
+            except TimeoutError:
+                return None
+            if ignore_subscribe_messages and message["type"] == "subscribe":
+                continue
+            return message
+
+    async def aclose(self) -> None:
+        if self in self._redis._subscribers:
+            self._redis._subscribers.remove(self)
+
+    def _deliver(self, channel: str, message: str) -> int:
+        if channel not in self._channels:
+            return 0
+        self._queue.put_nowait({"type": "message", "channel": channel, "data": message})
+        return 1
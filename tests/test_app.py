@@ -4,11 +4,14 @@ Test suite for the URL shortener.
 Unit tests: generate_code(), normalize_url() — no DB required.
 Integration tests: all routes — require the test PostgreSQL database.
 """
+import asyncio
 import os
+from datetime import datetime, timezone
 
 import asyncpg
 
-from app import generate_code, normalize_url
+import app as app_module
+from app import generate_code, insert_batch, normalize_url
 
 
 # ─────────────────────────────────────────────
@@ -65,6 +68,14 @@ class TestNormalizeUrl:
     def test_rejects_file_scheme(self):
         assert normalize_url("file:///etc/passwd") is None
 
+    def test_rejects_nul_byte(self):
+        assert normalize_url("https://bad.com/\x00") is None
+
+    def test_rejects_control_characters(self):
+        assert normalize_url("https://bad.com/\x1b[31m") is None
+        assert normalize_url("https://bad.com/a\nb") is None
+        assert normalize_url("https://bad.com/\x7f") is None
+
     def test_scheme_rejection_is_case_insensitive(self):
         assert normalize_url("JAVASCRIPT:alert(1)") is None
         assert normalize_url("DATA:text/plain,hello") is None
@@ -103,6 +114,16 @@ class TestHomeRoute:
         r = await client.get("/")
         assert r.status_code == 200
 
+    async def test_sends_etag(self, client):
+        r = await client.get("/")
+        assert r.headers["etag"].startswith('"')
+
+    async def test_matching_if_none_match_returns_304(self, client):
+        etag = (await client.get("/")).headers["etag"]
+        r = await client.get("/", headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.content == b""
+
 
 class TestShortenRoute:
     async def test_valid_url_returns_200(self, client):
@@ -139,6 +160,97 @@ class TestShortenRoute:
         assert count == 1
 
 
+class TestInsertCoalescing:
+    async def test_concurrent_requests_get_distinct_codes(self, client, db_pool):
+        responses = await asyncio.gather(*(
+            client.post(
+                "/shorten",
+                data={"long_url": f"https://example{i}.com"},
+                headers={"X-Forwarded-For": f"192.0.2.{100 + i}"},
+            )
+            for i in range(20)
+        ))
+        assert all(r.status_code == 200 for r in responses)
+        rows = await db_pool.fetch("SELECT code, long_url FROM urls")
+        assert len(rows) == 20
+        assert len({row["code"] for row in rows}) == 20
+
+    async def test_only_conflicting_rows_are_retried(self, db_pool, monkeypatch):
+        now = datetime.now(timezone.utc)
+        await db_pool.execute(
+            "INSERT INTO urls (code, long_url, created_at) VALUES ('taken1', 'https://old.com', $1)",
+            now,
+        )
+        candidates = iter(["taken1", "fresh1", "fresh2"])
+        monkeypatch.setattr(app_module, "generate_code", lambda: next(candidates))
+
+        codes = await insert_batch([("https://a.com", now), ("https://b.com", now)])
+
+        assert codes == ["fresh2", "fresh1"]
+        assert await db_pool.fetchval(
+            "SELECT long_url FROM urls WHERE code = 'fresh2'"
+        ) == "https://a.com"
+
+    async def test_bad_row_fails_only_its_own_caller(self, db_pool):
+        # Bypasses normalize_url so the NUL reaches Postgres, as it did before that check
+        coalescer = app_module.InsertCoalescer(max_batch_size=10, interval_ms=50)
+        coalescer.start()
+        now = datetime.now(timezone.utc)
+        try:
+            results = await asyncio.gather(
+                coalescer.submit("https://good1.com", now),
+                coalescer.submit("https://bad.com/\x00", now),
+                coalescer.submit("https://good2.com", now),
+                coalescer.submit("https://good3.com", now),
+                return_exceptions=True,
+            )
+        finally:
+            await coalescer.stop()
+
+        assert isinstance(results[1], asyncpg.DataError)
+        assert all(isinstance(code, str) for i, code in enumerate(results) if i != 1)
+        rows = await db_pool.fetch("SELECT long_url FROM urls ORDER BY long_url")
+        assert [row["long_url"] for row in rows] == [
+            "https://good1.com", "https://good2.com", "https://good3.com",
+        ]
+
+    async def test_batch_wide_error_fails_batch_without_splitting(self, db_pool, monkeypatch):
+        calls = []
+
+        async def missing_table(rows):
+            calls.append(len(rows))
+            raise asyncpg.UndefinedTableError('relation "urls" does not exist')
+
+        monkeypatch.setattr(app_module, "insert_batch", missing_table)
+        coalescer = app_module.InsertCoalescer(max_batch_size=10, interval_ms=50)
+        coalescer.start()
+        now = datetime.now(timezone.utc)
+        try:
+            results = await asyncio.gather(
+                *(coalescer.submit(f"https://example{i}.com", now) for i in range(8)),
+                return_exceptions=True,
+            )
+        finally:
+            await coalescer.stop()
+
+        assert calls == [8]
+        assert all(isinstance(result, asyncpg.UndefinedTableError) for result in results)
+
+    async def test_nul_byte_url_returns_400(self, client):
+        r = await client.post("/shorten", data={"long_url": "https://bad.com/\x00"})
+        assert r.status_code == 400
+
+    async def test_gives_up_after_max_attempts(self, db_pool, monkeypatch):
+        now = datetime.now(timezone.utc)
+        await db_pool.execute(
+            "INSERT INTO urls (code, long_url, created_at) VALUES ('taken1', 'https://old.com', $1)",
+            now,
+        )
+        monkeypatch.setattr(app_module, "generate_code", lambda: "taken1")
+
+        assert await insert_batch([("https://a.com", now)]) == [None]
+
+
 class TestRedirectRoute:
     async def test_valid_code_returns_302(self, client):
         await client.post("/shorten", data={"long_url": "https://example.com"})
@@ -182,6 +294,19 @@ class TestStatsRoute:
         r = await client.get("/stats/doesnotexist")
         assert r.status_code == 404
 
+    async def test_not_found_page_mentions_requested_code_only(self, client):
+        await client.get("/stats/firstcode")
+        r = await client.get("/stats/doesnotexist")
+        assert r.status_code == 404
+        assert b"firstcode" not in r.content
+
+    async def test_repeated_not_found_with_if_none_match_stays_404(self, client):
+        first = await client.get("/stats/doesnotexist")
+        assert "etag" not in first.headers
+        r = await client.get("/stats/doesnotexist", headers={"If-None-Match": "*"})
+        assert r.status_code == 404
+        assert r.content == first.content
+
 
 class TestTopRoute:
     async def test_empty_db_returns_200(self, client):
@@ -207,6 +332,17 @@ class TestTopRoute:
         body = r.text
         assert body.index("second.com") < body.index("first.com")
 
+    async def test_etag_changes_when_leaderboard_changes(self, client, db_pool):
+        await client.post("/shorten", data={"long_url": "https://example.com"})
+        first = await client.get("/top")
+        assert (await client.get("/top", headers={"If-None-Match": first.headers["etag"]})).status_code == 304
+
+        await db_pool.execute("UPDATE urls SET clicks = 7")
+        r = await client.get("/top", headers={"If-None-Match": first.headers["etag"]})
+        assert r.status_code == 200
+        assert r.headers["etag"] != first.headers["etag"]
+        assert b"7" in r.content
+
 
 # ─────────────────────────────────────────────
 # Rate Limiting Tests
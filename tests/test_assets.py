@@ -0,0 +1,115 @@
+"""
+Tests for the static asset build (scripts/build_static.py) and its serving.
+
+No DB required — PrecompressedStaticFiles is exercised as a standalone ASGI app.
+"""
+import gzip
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from assets import IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles, accepted_encodings, load_manifest
+from scripts.build_static import build
+
+CSS = b"body { font-family: sans-serif; }\n" * 20
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "style.css").write_bytes(CSS)
+    build(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+async def static_client(static_dir):
+    app = PrecompressedStaticFiles(directory=static_dir)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+
+
+def _dist_path(static_dir) -> str:
+    return load_manifest(static_dir)["style.css"]
+
+
+class TestBuildStatic:
+    def test_manifest_maps_to_fingerprinted_file(self, static_dir):
+        fingerprinted = _dist_path(static_dir)
+        assert fingerprinted.startswith("dist/style.")
+        assert fingerprinted.endswith(".css")
+        assert (static_dir / fingerprinted).read_bytes() == CSS
+
+    def test_writes_gzip_variant(self, static_dir):
+        gz = static_dir / (_dist_path(static_dir) + ".gz")
+        assert gzip.decompress(gz.read_bytes()) == CSS
+
+    def test_fingerprint_changes_with_content(self, static_dir):
+        before = _dist_path(static_dir)
+        (static_dir / "style.css").write_bytes(CSS + b"a { color: red; }\n")
+        build(static_dir)
+        assert _dist_path(static_dir) != before
+        assert not (static_dir / before).exists()
+
+    def test_rebuild_is_byte_identical(self, static_dir):
+        gz = static_dir / (_dist_path(static_dir) + ".gz")
+        first = gz.read_bytes()
+        build(static_dir)
+        assert gz.read_bytes() == first
+
+    def test_missing_manifest_is_empty(self, tmp_path):
+        assert load_manifest(tmp_path) == {}
+
+
+class TestAcceptedEncodings:
+    def test_parses_list_and_drops_q_zero(self):
+        assert accepted_encodings("gzip, br;q=0, deflate;q=0.5") == {"gzip", "deflate"}
+
+    def test_empty_header(self):
+        assert accepted_encodings("") == set()
+
+
+class TestPrecompressedStaticFiles:
+    async def test_gzip_variant_served_when_accepted(self, static_client, static_dir):
+        r = await static_client.get(
+            f"/{_dist_path(static_dir)}", headers={"Accept-Encoding": "gzip"}
+        )
+        assert r.status_code == 200
+        assert r.headers["content-encoding"] == "gzip"
+        assert r.headers["content-type"].startswith("text/css")
+        assert r.content == CSS  # httpx decodes the gzip body
+
+    async def test_brotli_preferred_when_present(self, static_client, static_dir):
+        br = static_dir / (_dist_path(static_dir) + ".br")
+        br.write_bytes(b"pretend-brotli")
+        # Streamed and never read, so httpx doesn't try to decode the fake body
+        async with static_client.stream(
+            "GET", f"/{_dist_path(static_dir)}", headers={"Accept-Encoding": "gzip, br"}
+        ) as r:
+            assert r.headers["content-encoding"] == "br"
+
+    async def test_identity_when_no_encoding_accepted(self, static_client, static_dir):
+        r = await static_client.get(
+            f"/{_dist_path(static_dir)}", headers={"Accept-Encoding": "identity"}
+        )
+        assert "content-encoding" not in r.headers
+        assert r.content == CSS
+
+    async def test_fingerprinted_files_are_immutable(self, static_client, static_dir):
+        r = await static_client.get(
+            f"/{_dist_path(static_dir)}", headers={"Accept-Encoding": "gzip"}
+        )
+        assert r.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert r.headers["vary"] == "Accept-Encoding"
+
+    async def test_unfingerprinted_files_are_not_immutable(self, static_client):
+        r = await static_client.get("/style.css")
+        assert r.status_code == 200
+        assert "immutable" not in r.headers.get("cache-control", "")
+
+    async def test_if_none_match_returns_304(self, static_client, static_dir):
+        path = f"/{_dist_path(static_dir)}"
+        first = await static_client.get(path, headers={"Accept-Encoding": "gzip"})
+        r = await static_client.get(
+            path, headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]}
+        )
+        assert r.status_code == 304
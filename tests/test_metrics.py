@@ -0,0 +1,144 @@
+"""
+Tests for multi-worker support: worker count, pool sizing and instance-wide metrics.
+
+Other workers are simulated by writing their counter files straight into the
+shared metrics directory.
+"""
+import json
+import os
+
+import pytest
+
+import app as app_module
+from app import pool_size
+from metrics import WorkerMetrics, render_prometheus
+from scripts.serve import worker_count
+
+ADMIN = {"X-Admin-Token": "secret"}
+# PID 1 always exists; a huge PID never does
+LIVE_PID, DEAD_PID = 1, 2**22 + 7
+
+
+def _write_worker(directory, pid: int, counters: dict) -> None:
+    (directory / f"worker-{pid}.json").write_text(json.dumps(counters))
+
+
+class TestPoolSize:
+    def test_budget_split_across_workers(self):
+        assert pool_size(20, 4) == (2, 5)
+
+    def test_single_worker_keeps_whole_budget(self):
+        assert pool_size(10, 1) == (2, 10)
+
+    def test_one_connection_per_worker_at_the_limit(self):
+        assert pool_size(3, 3) == (1, 1)
+
+
+REDIS = "redis://localhost:6379"
+
+
+class TestWorkerCount:
+    def test_shared_limiter_storage_allows_many_workers(self):
+        assert worker_count(4, REDIS, budget=10) == 4
+
+    def test_in_memory_limiter_falls_back_to_one_worker(self, capsys):
+        assert worker_count(4, "memory://", budget=10) == 1
+        assert "REDIS_URL" in capsys.readouterr().err
+
+    def test_single_worker_with_in_memory_limiter_is_fine(self, capsys):
+        assert worker_count(1, "memory://", budget=10) == 1
+        assert capsys.readouterr().err == ""
+
+    def test_capped_at_connection_budget(self, capsys):
+        workers = worker_count(8, REDIS, budget=3)
+        assert workers == 3
+        assert "DB_CONNECTION_BUDGET" in capsys.readouterr().err
+        assert pool_size(3, workers)[1] * workers <= 3
+
+
+class TestWorkerMetrics:
+    def test_without_directory_reports_this_worker(self):
+        metrics = WorkerMetrics()
+        metrics.inc("redirects_total", 3)
+        assert metrics.aggregate() == ({"redirects_total": 3}, 1)
+
+    def test_sums_counters_across_workers(self, tmp_path):
+        metrics = WorkerMetrics(tmp_path)
+        metrics.inc("redirects_total", 3)
+        _write_worker(tmp_path, LIVE_PID, {"redirects_total": 4, "links_created_total": 1})
+
+        totals, workers = metrics.aggregate()
+
+        assert totals == {"redirects_total": 7, "links_created_total": 1}
+        assert workers == 2
+
+    def test_exited_workers_still_count_but_are_not_live(self, tmp_path):
+        metrics = WorkerMetrics(tmp_path)
+        _write_worker(tmp_path, DEAD_PID, {"redirects_total": 5})
+
+        totals, workers = metrics.aggregate()
+
+        assert totals == {"redirects_total": 5}
+        assert workers == 1
+
+    def test_sources_are_merged_into_snapshot(self):
+        metrics = WorkerMetrics()
+        metrics.sources.append(lambda: {"redirect_cache_l1_hits_total": 2})
+        assert metrics.snapshot() == {"redirect_cache_l1_hits_total": 2}
+
+    def test_flush_writes_own_file(self, tmp_path):
+        metrics = WorkerMetrics(tmp_path)
+        metrics.inc("redirects_total")
+        metrics.flush()
+        path = tmp_path / f"worker-{os.getpid()}.json"
+        assert json.loads(path.read_text()) == {"redirects_total": 1}
+
+    def test_prometheus_rendering(self):
+        text = render_prometheus({"redirects_total": 7}, workers=2)
+        assert "url_shortener_workers 2\n" in text
+        assert "# TYPE url_shortener_redirects_total counter\n" in text
+        assert "url_shortener_redirects_total 7\n" in text
+
+
+# ─────────────────────────────────────────────
+# Integration Tests — require DB
+# ─────────────────────────────────────────────
+
+
+@pytest.fixture
+def shared_metrics(tmp_path, monkeypatch):
+    metrics = WorkerMetrics(tmp_path)
+    metrics.sources.extend(app_module.metrics.sources)
+    monkeypatch.setattr(app_module, "metrics", metrics)
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    return metrics
+
+
+class TestMetricsRoute:
+    async def test_requires_token(self, client, shared_metrics):
+        r = await client.get("/metrics")
+        assert r.status_code == 404
+
+    async def test_accepts_bearer_token(self, client, shared_metrics):
+        r = await client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        assert r.status_code == 200
+
+    async def test_reports_instance_wide_counters(self, client, db_pool, shared_metrics, tmp_path):
+        await db_pool.execute(
+            "INSERT INTO urls (code, long_url) VALUES ('abc123', 'https://example.com')"
+        )
+        await client.get("/abc123")
+        await client.get("/abc123")
+        _write_worker(tmp_path, LIVE_PID, {"redirects_total": 10})
+
+        r = await client.get("/metrics", headers=ADMIN)
+
+        assert "url_shortener_redirects_total 12\n" in r.text
+        assert "url_shortener_workers 2\n" in r.text
+        assert "url_shortener_redirect_cache_l1_hits_total 1\n" in r.text
+
+    async def test_counts_created_links_and_batches(self, client, shared_metrics):
+        await client.post("/shorten", data={"long_url": "https://example.com"})
+        totals, _ = shared_metrics.aggregate()
+        assert totals["links_created_total"] == 1
+        assert totals["insert_batch_rows_total"] == 1
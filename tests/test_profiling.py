@@ -0,0 +1,164 @@
+"""
+Tests for opt-in request profiling and slow-query tracing.
+
+The app's own ProfilingMiddleware is built at import time with profiling
+off, so integration tests wrap the app in a second, enabled instance.
+"""
+import os
+from collections import deque
+from types import SimpleNamespace
+
+import asyncpg
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+import app as app_module
+from app import app as fastapi_app
+from profiling import ProfilingMiddleware, SlowQueryLogger, param_shape, span
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def profile_buffer(monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    app_module.profile_buffer.clear()
+    app_module.slow_query_buffer.clear()
+    yield app_module.profile_buffer
+    app_module.profile_buffer.clear()
+    app_module.slow_query_buffer.clear()
+
+
+@pytest.fixture
+async def profiled_client(client, profile_buffer):
+    """Client whose requests pass through an enabled ProfilingMiddleware."""
+    wrapped = ProfilingMiddleware(fastapi_app, buffer=profile_buffer, admin_token="secret")
+    async with AsyncClient(transport=ASGITransport(app=wrapped), base_url="http://test") as ac:
+        yield ac
+
+
+# ─────────────────────────────────────────────
+# Unit Tests — no DB
+# ─────────────────────────────────────────────
+
+
+class TestSpan:
+    def test_noop_outside_profiled_request(self):
+        with span("anything") as result:
+            assert result is None
+
+
+class TestParamShape:
+    def test_sized_values_report_length(self):
+        assert param_shape("https://example.com") == "str[19]"
+        assert param_shape(["a", "b"]) == "list[2]"
+
+    def test_other_values_report_type_only(self):
+        assert param_shape(42) == "int"
+        assert param_shape(None) == "NoneType"
+
+
+class TestSlowQueryLogger:
+    def _record(self, elapsed, args=("abc123",)):
+        return SimpleNamespace(
+            query="SELECT long_url\n  FROM urls WHERE code = $1",
+            args=args, elapsed=elapsed, exception=None,
+        )
+
+    def test_ignores_fast_queries(self):
+        buffer = deque()
+        SlowQueryLogger(buffer, threshold_ms=50)(self._record(0.001))
+        assert not buffer
+
+    def test_records_slow_query_with_param_shapes(self):
+        buffer = deque()
+        SlowQueryLogger(buffer, threshold_ms=50)(self._record(0.2))
+        assert buffer[0]["query"] == "SELECT long_url FROM urls WHERE code = $1"
+        assert buffer[0]["params"] == ["str[6]"]
+        assert buffer[0]["elapsed_ms"] == 200.0
+
+
+# ─────────────────────────────────────────────
+# Integration Tests — require DB
+# ─────────────────────────────────────────────
+
+
+class TestRequestProfiling:
+    async def test_unprofiled_request_records_nothing(self, profiled_client, profile_buffer):
+        await profiled_client.get("/top")
+        assert not profile_buffer
+
+    async def test_header_without_token_is_ignored(self, profiled_client, profile_buffer):
+        await profiled_client.get("/top", headers={"X-Profile": "spans", "X-Admin-Token": "wrong"})
+        assert not profile_buffer
+
+    async def test_spans_cover_pool_query_and_render(self, profiled_client, profile_buffer):
+        r = await profiled_client.get("/top", headers={"X-Profile": "spans", **ADMIN})
+        assert r.status_code == 200
+        profile = profile_buffer[-1]
+        assert profile["path"] == "/top"
+        assert profile["status_code"] == 200
+        assert [s["name"] for s in profile["spans"]] == ["pool.acquire", "db.select", "render"]
+        assert profile["duration_ms"] >= sum(s["duration_ms"] for s in profile["spans"])
+
+    async def test_redirect_spans_nest_cache_fill(self, profiled_client, db_pool, profile_buffer):
+        await db_pool.execute(
+            "INSERT INTO urls (code, long_url) VALUES ('abc123', 'https://example.com')"
+        )
+        await profiled_client.get("/abc123", headers={"X-Profile": "spans", **ADMIN})
+        spans = {s["name"]: s for s in profile_buffer[-1]["spans"]}
+        assert spans["redirect_cache.get"]["depth"] == 0
+        assert spans["db.select"]["depth"] == 1
+        assert spans["db.update"]["depth"] == 0
+
+    async def test_cprofile_mode_dumps_stats(self, profiled_client, profile_buffer):
+        await profiled_client.get("/", headers={"X-Profile": "cprofile", **ADMIN})
+        assert "function calls" in profile_buffer[-1]["cprofile"]
+
+    async def test_sampling_profiles_without_header(self, client, profile_buffer):
+        wrapped = ProfilingMiddleware(fastapi_app, buffer=profile_buffer, sample_rate=1.0)
+        async with AsyncClient(transport=ASGITransport(app=wrapped), base_url="http://test") as ac:
+            await ac.get("/")
+        assert profile_buffer[-1]["mode"] == "spans"
+
+
+class TestAdminProfilesRoute:
+    async def test_requires_token(self, client, profile_buffer):
+        r = await client.get("/admin/profiles")
+        assert r.status_code == 404
+
+    async def test_disabled_without_configured_token(self, client, monkeypatch):
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", "")
+        r = await client.get("/admin/profiles", headers={"X-Admin-Token": ""})
+        assert r.status_code == 404
+
+    async def test_lists_captured_profiles(self, profiled_client, profile_buffer):
+        await profiled_client.get("/top", headers={"X-Profile": "spans", **ADMIN})
+        r = await profiled_client.get("/admin/profiles", headers=ADMIN)
+        assert r.status_code == 200
+        assert r.json()["profiles"][0]["path"] == "/top"
+
+
+class TestSlowQueryTracing:
+    async def test_pool_connections_log_slow_queries(self, db_pool, profile_buffer, monkeypatch):
+        monkeypatch.setattr(app_module, "SLOW_QUERY_MS", 0.000001)
+        pool = await asyncpg.create_pool(
+            os.environ["DATABASE_URL"], init=app_module.init_connection
+        )
+        try:
+            await pool.fetchval("SELECT $1::text", "hello")
+        finally:
+            await pool.close()
+        entries = [e for e in app_module.slow_query_buffer if e["query"] == "SELECT $1::text"]
+        assert entries[0]["params"] == ["str[5]"]
+
+    async def test_no_logger_when_disabled(self, db_pool, profile_buffer, monkeypatch):
+        monkeypatch.setattr(app_module, "SLOW_QUERY_MS", 0)
+        pool = await asyncpg.create_pool(
+            os.environ["DATABASE_URL"], init=app_module.init_connection
+        )
+        try:
+            await pool.fetchval("SELECT 1")
+        finally:
+            await pool.close()
+        assert not app_module.slow_query_buffer
@@ -0,0 +1,270 @@
+"""
+Tests for the two-tier redirect cache.
+
+Runs against tests/fake_redis.py by default, or a real server when
+TEST_REDIS_URL is set (see the redis_client fixture in conftest.py).
+"""
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import app as app_module
+import redirect_cache as redirect_cache_module
+from redirect_cache import RedirectCache
+from tests.fake_redis import FakeRedis
+
+
+class CountingLoader:
+    """Loader that records calls and can be held open to force overlapping misses."""
+
+    def __init__(self, mapping: dict[str, str]) -> None:
+        self.mapping = mapping
+        self.calls: list[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, code: str) -> str | None:
+        self.calls.append(code)
+        await self.release.wait()
+        return self.mapping.get(code)
+
+
+class BrokenRedis(FakeRedis):
+    """Every command fails, after being recorded in `commands`."""
+
+    async def get(self, key):
+        self.commands.append(("GET", key))
+        raise RedisConnectionError("down")
+
+    async def mget(self, keys):
+        self.commands.append(("MGET", *keys))
+        raise RedisConnectionError("down")
+
+    async def set(self, key, value, ex=None):
+        self.commands.append(("SET", key, value))
+        raise RedisConnectionError("down")
+
+
+class UnreachableRedis(FakeRedis):
+    """Refuses pub/sub connections until `down` is cleared."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.down = True
+
+    def pubsub(self):
+        pubsub = super().pubsub()
+        subscribe = pubsub.subscribe
+
+        async def guarded_subscribe(*channels):
+            if self.down:
+                raise RedisConnectionError("connection refused")
+            await subscribe(*channels)
+
+        pubsub.subscribe = guarded_subscribe
+        return pubsub
+
+
+@pytest.fixture
+async def hung_redis_url():
+    """A TCP server that accepts connections and never answers."""
+    writers = []
+    server = await asyncio.start_server(lambda reader, writer: writers.append(writer), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"redis://127.0.0.1:{port}"
+    for writer in writers:
+        writer.close()
+    server.close()
+    await server.wait_closed()
+
+
+async def _drain() -> None:
+    """Let the pub/sub listener task process queued messages."""
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+# ─────────────────────────────────────────────
+# Cache behaviour — no routes involved
+# ─────────────────────────────────────────────
+
+
+class TestRedirectCache:
+    async def test_l1_hit_skips_loader(self):
+        cache = RedirectCache()
+        loader = CountingLoader({"abc123": "https://example.com"})
+        assert await cache.get("abc123", loader) == "https://example.com"
+        assert await cache.get("abc123", loader) == "https://example.com"
+        assert loader.calls == ["abc123"]
+
+    async def test_unknown_code_is_not_cached(self):
+        cache = RedirectCache()
+        loader = CountingLoader({})
+        assert await cache.get("nope00", loader) is None
+        assert await cache.get("nope00", loader) is None
+        assert loader.calls == ["nope00", "nope00"]
+
+    async def test_concurrent_misses_share_one_fill(self, redis_client):
+        cache = RedirectCache(redis_client)
+        loader = CountingLoader({"abc123": "https://example.com"})
+        loader.release.clear()
+
+        waiters = [asyncio.create_task(cache.get("abc123", loader)) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        loader.release.set()
+
+        assert await asyncio.gather(*waiters) == ["https://example.com"] * 10
+        assert loader.calls == ["abc123"]
+
+    async def test_fill_populates_l2_for_other_instances(self, redis_client):
+        first = RedirectCache(redis_client)
+        await first.get("abc123", CountingLoader({"abc123": "https://example.com"}))
+
+        second = RedirectCache(redis_client)
+        loader = CountingLoader({})
+        assert await second.get("abc123", loader) == "https://example.com"
+        assert loader.calls == []
+
+    async def test_concurrent_l2_reads_coalesce_into_one_mget(self):
+        redis = FakeRedis()
+        for code in ("aaa111", "bbb222", "ccc333"):
+            await redis.set(f"redirect:{code}", f"https://{code}.example")
+        redis.commands.clear()
+        cache = RedirectCache(redis)
+
+        results = await asyncio.gather(
+            *(cache.get(code, CountingLoader({})) for code in ("aaa111", "bbb222", "ccc333"))
+        )
+
+        assert results == ["https://aaa111.example", "https://bbb222.example", "https://ccc333.example"]
+        assert [cmd[0] for cmd in redis.commands] == ["MGET"]
+
+    async def test_invalidate_drops_every_instance(self, redis_client):
+        first, second = RedirectCache(redis_client), RedirectCache(redis_client)
+        await first.start()
+        await second.start()
+        try:
+            loader = CountingLoader({"abc123": "https://example.com"})
+            await first.get("abc123", loader)
+            await second.get("abc123", loader)
+
+            loader.mapping["abc123"] = "https://moved.example"
+            await first.invalidate("abc123")
+            await _drain()
+
+            assert await redis_client.get("redirect:abc123") is None
+            assert await second.get("abc123", loader) == "https://moved.example"
+        finally:
+            await first.stop()
+            await second.stop()
+
+    async def test_expired_l2_key_drops_l1_entry(self, redis_client):
+        if not isinstance(redis_client, FakeRedis):
+            pytest.skip("expiry is driven by the fake's manual clock")
+        cache = RedirectCache(redis_client, ttl=30)
+        await cache.start()
+        try:
+            loader = CountingLoader({"abc123": "https://example.com"})
+            await cache.get("abc123", loader)
+            redis_client.advance(31)
+            await _drain()
+
+            await cache.get("abc123", loader)
+            assert loader.calls == ["abc123", "abc123"]
+        finally:
+            await cache.stop()
+
+    async def test_expiries_in_other_databases_are_ignored(self):
+        redis = FakeRedis(db=1)
+        cache = RedirectCache(redis)
+        await cache.start()
+        try:
+            loader = CountingLoader({"abc123": "https://example.com"})
+            await cache.get("abc123", loader)
+            # A rate limiter key expiring in db 0 isn't even delivered
+            assert redis._deliver("__keyevent@0__:expired", "redirect:abc123") == 0
+            redis.advance(cache.ttl + 1)
+            await _drain()
+
+            await cache.get("abc123", loader)
+            assert loader.calls == ["abc123", "abc123"]
+        finally:
+            await cache.stop()
+
+    async def test_l1_evicts_least_recently_used(self):
+        cache = RedirectCache(l1_size=2)
+        loader = CountingLoader({"a": "https://a.example", "b": "https://b.example", "c": "https://c.example"})
+        for code in ("a", "b", "a", "c"):
+            await cache.get(code, loader)
+        await cache.get("a", loader)
+        await cache.get("b", loader)
+        assert loader.calls == ["a", "b", "c", "b"]
+
+    async def test_redis_errors_fall_back_to_loader(self):
+        cache = RedirectCache(BrokenRedis())
+        loader = CountingLoader({"abc123": "https://example.com"})
+        assert await cache.get("abc123", loader) == "https://example.com"
+
+    async def test_failed_l2_read_skips_l2_write(self):
+        redis = BrokenRedis()
+        cache = RedirectCache(redis)
+        await cache.get("abc123", CountingLoader({"abc123": "https://example.com"}))
+        assert [cmd[0] for cmd in redis.commands] == ["MGET"]
+
+    async def test_start_survives_unreachable_redis(self, monkeypatch):
+        monkeypatch.setattr(redirect_cache_module, "RESUBSCRIBE_DELAY_SECONDS", 0.01)
+        redis = UnreachableRedis()
+        cache = RedirectCache(redis)
+        await cache.start()
+        try:
+            loader = CountingLoader({"abc123": "https://example.com"})
+            await cache.get("abc123", loader)
+
+            redis.down = False
+            await _drain()
+            await redis.publish(cache.channel, "abc123")
+            await _drain()
+
+            # The L1 entry was dropped, so this read goes back to Redis
+            await cache.get("abc123", loader)
+            assert cache.stats["l2_hits"] == 1
+        finally:
+            await cache.stop()
+
+    async def test_hung_redis_falls_through_to_loader(self, hung_redis_url, monkeypatch):
+        monkeypatch.setattr(app_module, "REDIRECT_CACHE_URL", hung_redis_url)
+        monkeypatch.setattr(app_module, "REDIRECT_CACHE_TIMEOUT", 0.1)
+        cache = app_module.create_redirect_cache()
+        try:
+            loader = CountingLoader({"abc123": "https://example.com"})
+            result = await asyncio.wait_for(cache.get("abc123", loader), timeout=2)
+            assert result == "https://example.com"
+        finally:
+            await cache.redis.aclose()
+
+
+# ─────────────────────────────────────────────
+# Integration Tests — redirect route through the cache
+# ─────────────────────────────────────────────
+
+
+class TestRedirectRouteCaching:
+    async def test_cached_redirect_still_counts_clicks(self, client, db_pool, redis_client, monkeypatch):
+        monkeypatch.setattr(app_module, "redirect_cache", RedirectCache(redis_client))
+        await db_pool.execute(
+            "INSERT INTO urls (code, long_url) VALUES ('abc123', 'https://example.com')"
+        )
+        for _ in range(3):
+            r = await client.get("/abc123", follow_redirects=False)
+            assert r.headers["location"] == "https://example.com"
+        assert await db_pool.fetchval("SELECT clicks FROM urls WHERE code = 'abc123'") == 3
+        assert await redis_client.get("redirect:abc123") == "https://example.com"
+
+    async def test_l2_hit_serves_code_missing_from_this_instance(self, client, redis_client, monkeypatch):
+        # Another instance already filled L2; this one never asks Postgres for the URL
+        monkeypatch.setattr(app_module, "redirect_cache", RedirectCache(redis_client))
+        await redis_client.set("redirect:abc123", "https://from-l2.example")
+        r = await client.get("/abc123", follow_redirects=False)
+        assert r.status_code == 302
+        assert r.headers["location"] == "https://from-l2.example"
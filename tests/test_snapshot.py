@@ -0,0 +1,214 @@
+"""
+Tests for the memory-mapped redirect snapshot.
+
+Unit tests: write_snapshot() / RedirectSnapshot round trips — no DB required.
+Integration tests: redirect route falling back to / preferring the snapshot.
+"""
+import os
+import time
+
+import asyncpg
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+import app as app_module
+from snapshot import RedirectSnapshot, SnapshotError, write_snapshot
+
+ROWS = [
+    ("abc123", "https://example.com"),
+    ("Zz9", "https://short-code.example"),
+    ("zzzzzz", "https://unicode.example/café"),
+    ("A", "https://one-char.example"),
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = tmp_path / "redirects.snap"
+    write_snapshot(path, ROWS)
+    snap = RedirectSnapshot(path)
+    yield snap
+    snap.close()
+
+
+# ─────────────────────────────────────────────
+# Unit Tests — snapshot file format
+# ─────────────────────────────────────────────
+
+
+class TestRedirectSnapshot:
+    def test_every_written_code_is_found(self, snapshot):
+        for code, long_url in ROWS:
+            assert snapshot.get(code) == long_url
+
+    def test_len_matches_rows_written(self, snapshot):
+        assert len(snapshot) == len(ROWS)
+
+    def test_unknown_code_returns_none(self, snapshot):
+        assert snapshot.get("nope00") is None
+
+    def test_prefix_of_existing_code_returns_none(self, snapshot):
+        assert snapshot.get("abc") is None
+
+    def test_code_longer_than_index_width_returns_none(self, snapshot):
+        assert snapshot.get("abc1234") is None
+
+    def test_empty_snapshot(self, tmp_path):
+        path = tmp_path / "empty.snap"
+        assert write_snapshot(path, []) == 0
+        snap = RedirectSnapshot(path)
+        assert len(snap) == 0
+        assert snap.get("abc123") is None
+        snap.close()
+
+    def test_rejects_non_snapshot_file(self, tmp_path):
+        path = tmp_path / "bogus.snap"
+        path.write_bytes(b"not a snapshot at all, just bytes")
+        with pytest.raises(SnapshotError):
+            RedirectSnapshot(path)
+
+    def test_rejects_truncated_file(self, tmp_path):
+        path = tmp_path / "redirects.snap"
+        write_snapshot(path, ROWS)
+        path.write_bytes(path.read_bytes()[:40])
+        with pytest.raises(SnapshotError):
+            RedirectSnapshot(path)
+
+
+# ─────────────────────────────────────────────
+# Integration Tests — redirect route tiers
+# ─────────────────────────────────────────────
+
+
+# Nothing listens on port 1, so every connection attempt is refused
+UNREACHABLE_DB_URL = "postgresql://postgres@127.0.0.1:1/none"
+
+
+@pytest.fixture
+async def broken_pool(db_pool, monkeypatch):
+    """Swap in a pool pointed at a dead address so every acquire() is refused."""
+    pool = await asyncpg.create_pool(UNREACHABLE_DB_URL, min_size=0)
+    monkeypatch.setattr(app_module, "db_pool", pool)
+    yield pool
+    await pool.close()
+
+
+@pytest.fixture
+async def stalled_pool(db_pool, monkeypatch):
+    """Swap in a one-connection pool whose only connection is checked out, so acquire() hangs."""
+    pool = await asyncpg.create_pool(os.environ["DATABASE_URL"], min_size=1, max_size=1)
+    held = await pool.acquire()
+    monkeypatch.setattr(app_module, "db_pool", pool)
+    yield pool
+    await pool.release(held)
+    await pool.close()
+
+
+class TestSnapshotFallback:
+    async def test_db_down_without_snapshot_fails(self, client, broken_pool, monkeypatch):
+        monkeypatch.setattr(app_module, "redirect_snapshot", None)
+        with pytest.raises(ConnectionRefusedError):
+            await client.get("/abc123", follow_redirects=False)
+
+    async def test_db_down_serves_from_snapshot(self, client, snapshot, broken_pool, monkeypatch):
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        r = await client.get("/abc123", follow_redirects=False)
+        assert r.status_code == 302
+        assert r.headers["location"] == "https://example.com"
+
+    async def test_db_down_and_code_not_in_snapshot_returns_503(
+        self, client, snapshot, broken_pool, monkeypatch
+    ):
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        r = await client.get("/newcode", follow_redirects=False)
+        assert r.status_code == 503
+
+    async def test_slow_db_serves_from_snapshot_after_timeout(
+        self, client, snapshot, stalled_pool, monkeypatch
+    ):
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        monkeypatch.setattr(app_module, "REDIRECT_DB_TIMEOUT", 0.2)
+        started = time.monotonic()
+        r = await client.get("/abc123", follow_redirects=False)
+        elapsed = time.monotonic() - started
+        assert r.status_code == 302
+        assert r.headers["location"] == "https://example.com"
+        assert 0.2 <= elapsed < 2
+
+    async def test_admin_shutdown_serves_from_snapshot(self, client, snapshot, monkeypatch):
+        async def shutting_down(code):
+            raise asyncpg.AdminShutdownError("terminating connection due to administrator command")
+
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        monkeypatch.setattr(app_module, "lookup_long_url", shutting_down)
+        r = await client.get("/abc123", follow_redirects=False)
+        assert r.status_code == 302
+        assert r.headers["location"] == "https://example.com"
+
+    async def test_non_connection_errors_are_not_masked(self, client, snapshot, monkeypatch):
+        async def broken_loader(code):
+            raise asyncpg.UndefinedTableError("relation \"urls\" does not exist")
+
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        monkeypatch.setattr(app_module, "lookup_long_url", broken_loader)
+        with pytest.raises(asyncpg.UndefinedTableError):
+            await client.get("/abc123", follow_redirects=False)
+
+    async def test_db_up_still_counts_clicks(self, client, db_pool, snapshot, monkeypatch):
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        await db_pool.execute(
+            "INSERT INTO urls (code, long_url) VALUES ('abc123', 'https://example.com')"
+        )
+        r = await client.get("/abc123", follow_redirects=False)
+        assert r.status_code == 302
+        assert await db_pool.fetchval("SELECT clicks FROM urls WHERE code = 'abc123'") == 1
+
+
+class TestStartupWithoutDatabase:
+    async def test_worker_boots_and_serves_snapshot(self, db_pool, tmp_path, monkeypatch):
+        path = tmp_path / "redirects.snap"
+        write_snapshot(path, ROWS)
+        monkeypatch.setattr(app_module, "DATABASE_URL", UNREACHABLE_DB_URL)
+        monkeypatch.setattr(app_module, "REDIRECT_SNAPSHOT_PATH", str(path))
+        monkeypatch.delenv("SKIP_DB_INIT")
+
+        async with app_module.lifespan(app_module.app):
+            transport = ASGITransport(app=app_module.app)
+            async with AsyncClient(transport=transport, base_url="http://test") as ac:
+                r = await ac.get("/abc123", follow_redirects=False)
+        assert r.status_code == 302
+        assert r.headers["location"] == "https://example.com"
+
+    async def test_without_snapshot_startup_still_fails(self, db_pool, monkeypatch):
+        monkeypatch.setattr(app_module, "DATABASE_URL", UNREACHABLE_DB_URL)
+        monkeypatch.setattr(app_module, "REDIRECT_SNAPSHOT_PATH", "")
+        with pytest.raises(OSError):
+            async with app_module.lifespan(app_module.app):
+                pass
+
+
+class TestSnapshotPrimary:
+    async def test_snapshot_hit_skips_db_lookup(self, client, snapshot, monkeypatch):
+        # Nothing in the DB — the redirect can only have come from the snapshot
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        monkeypatch.setattr(app_module, "REDIRECT_SNAPSHOT_MODE", "primary")
+        r = await client.get("/Zz9", follow_redirects=False)
+        assert r.status_code == 302
+        assert r.headers["location"] == "https://short-code.example"
+
+    async def test_newer_codes_come_from_db(self, client, db_pool, snapshot, monkeypatch):
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        monkeypatch.setattr(app_module, "REDIRECT_SNAPSHOT_MODE", "primary")
+        await db_pool.execute(
+            "INSERT INTO urls (code, long_url) VALUES ('new001', 'https://newer.example')"
+        )
+        r = await client.get("/new001", follow_redirects=False)
+        assert r.headers["location"] == "https://newer.example"
+
+    async def test_snapshot_hit_survives_db_outage(
+        self, client, snapshot, broken_pool, monkeypatch
+    ):
+        monkeypatch.setattr(app_module, "redirect_snapshot", snapshot)
+        monkeypatch.setattr(app_module, "REDIRECT_SNAPSHOT_MODE", "primary")
+        r = await client.get("/zzzzzz", follow_redirects=False)
+        assert r.status_code == 302